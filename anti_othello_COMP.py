@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
 import sys
+import os
 from typing import List, Tuple
-from copy import deepcopy
 import time
 from random import choices
+from symmetry import canonical, transform_move, untransform_move
+from stability import stable_discs
 
 
 GLOBAL_DEPTH = 4
@@ -13,13 +15,99 @@ ALPHA_BETA_DEPTH = 3
 ALPHA_BETA_DEPTH_PLAYER_2 = 2
 MAX_CHOICES = 8
 
+#Stable discs are a permanent liability, each one is worth this much in scoring
+STABILITY_WEIGHT = 8
+
+#With this many empties or fewer the game is solved exactly if time allows
+ENDGAME_EMPTIES = 10
+#Share of the move's budget the exact solve may use, the rest is left for the heuristic search if it fails
+ENDGAME_SHARE = .5
+#Stability cutoffs are only tried with more empties than this, below it they cost more than they save
+STABILITY_CUTOFF_EMPTIES = 3
+
+#Transposition table entry flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
 TIME_ALLOWED = .8
 
+#Clock based time allocation, used when the referee sends 'get move <remaining> [<increment>]' in seconds
+EMERGENCY_TIME = 2
+EMERGENCY_BUDGET = .05
+MIN_MOVES_TO_GO = 4
+MAX_DEPTH = 20
+CRITICAL_EXTENSION = 1.5
+#A move never gets more than this share of the clock left after CLOCK_MARGIN, the increment only arrives after the move
+MAX_CLOCK_SHARE = .25
+CLOCK_MARGIN = .2
+
 best_move_GLOBAL = None
 
+#Set ANTI_OTHELLO_PROFILE=<dir> or pass --profile <dir> to profile every search
+PROFILE_DIR = os.environ.get('ANTI_OTHELLO_PROFILE')
+
+#Set ANTI_OTHELLO_SMP=<workers> or pass --smp <workers> to search with Lazy-SMP worker processes
+SMP_WORKERS = os.environ.get('ANTI_OTHELLO_SMP')
+
+#Set ANTI_OTHELLO_LOG=<file> or pass --log <file> to append every game to a binary game log
+LOG_PATH = os.environ.get('ANTI_OTHELLO_LOG')
+
 def debug_print(*args):
   print(*args, file=sys.stderr, flush=True)
 
+def get_rays(pos):
+  '''
+  returns the squares in each of the 8 directions from pos, nearest first
+  '''
+  (x, y) = (pos % 8, pos // 8)
+  rays = []
+  for deltaX, deltaY in ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+    ray = []
+    tempX = x + deltaX
+    tempY = y + deltaY
+    while 0 <= tempX <= 7 and 0 <= tempY <= 7:
+      ray.append(tempX + 8 * tempY)
+      tempX += deltaX
+      tempY += deltaY
+    #a ray needs room for a disc to flip and one to close it
+    if len(ray) >= 2: rays.append(ray)
+  return rays
+
+RAYS = [get_rays(pos) for pos in range(64)]
+
+def get_option(flag, default = None):
+  '''
+  returns the value following flag on the command line, if any
+  '''
+  if flag in sys.argv[:-1]:
+    return sys.argv[sys.argv.index(flag) + 1]
+  return default
+
+def allocate_time(remaining: float, increment: float, empties: int) -> Tuple:
+  '''
+  Splits the remaining clock over the moves we still have to play
+  :param remaining: seconds left on our clock
+  :param increment: seconds added after every move
+  :param empties: empty squares on the board
+  :return: (soft, hard) budget in seconds, and whether we are in emergency mode
+  '''
+  if remaining <= EMERGENCY_TIME:
+    return (0, min(EMERGENCY_BUDGET, remaining / 4), True)
+
+  #we play about half of the remaining empties
+  moves_to_go = max(empties / 2, MIN_MOVES_TO_GO)
+  base = remaining / moves_to_go + increment * .8
+
+  #the opening is cheap, the middlegame decides the game
+  if empties > 44: phase = .6
+  elif empties > 16: phase = 1.4
+  else: phase = 1
+
+  hard = min(base * phase * 3, (remaining - CLOCK_MARGIN) * MAX_CLOCK_SHARE)
+  soft = min(base * phase, hard)
+  return (soft, hard, False)
+
 def xy_to_alphanum(pos):
   '''
   assumes 0-indexed coordinate
@@ -99,27 +187,60 @@ class Game(object):
         ]
 
         self.start_time = time.time()
+        #time a get move without a clock may search, in seconds
+        self.move_time = TIME_ALLOWED
+        self.time_budget = self.move_time
+        self.root_depth = ALPHA_BETA_DEPTH
+        self.nodes = 0
+
+        #time the last askForAIMove_COMP was allowed to search, in seconds, and the depth it completed
+        self.move_budget = self.move_time
+        self.move_depth = 0
+
+        #LazySMP searcher from lazy_smp.py, when searching with worker processes
+        self.smp = None
+
+        #transposition table keyed on the symmetry-canonical position, see symmetry.py
+        self.tt = {}
 
     def alphaBeta(self, node: List, depth: int, alpha: int, beta: int, maximizing: int) -> Tuple:
         '''
         maximizing = 0 gets best result for black
         maximizing = 1 gets best result for white
         '''
+        self.nodes += 1
 
-        choices = self.getPossibleMoves(node)
-        boards = [self.move(i, node, maximizing) for i in choices]
-
+        #legal moves and their flips come out of one pass, children are built straight from them
+        moves = self.getMovesWithFlips(node, maximizing)
 
-
-        if depth == 0 or len(choices) == 0:
+        if depth == 0 or len(moves) == 0:
             return ([-self.scoring(node, maximizing), node]) #to negative or not to negative... that is the question
 
+        choices = [pos for pos, flips in moves]
 
-        if time.time() - self.start_time >= TIME_ALLOWED: return ([-self.scoring(boards[0], maximizing), boards[0], choices[0]])
+        if time.time() - self.start_time >= self.time_budget:
+            board = self.applyMove(*moves[0], node, maximizing)
+            return ([-self.scoring(board, maximizing), board, choices[0]])
         global best_move_GLOBAL
 
+        #Symmetric positions share one entry, the stored move is mapped back through the transform
+        #The table is probed before any child is built, a hit only builds the board of the stored move
+        (key, transform) = canonical(node)
+        key = (key, self.player, maximizing)
+        entry = self.tt.get(key)
+        if entry and entry[0] >= depth:
+            (_, flag, value, choice) = entry
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                choice = untransform_move(choice, transform)
+                flips = dict(moves).get(choice)
+                #a shared table can hand back another position's entry on a hash collision
+                if flips is not None:
+                    return ([value, self.applyMove(choice, flips, node, maximizing), choice])
+        alpha_original = alpha
+        beta_original = beta
+
         #If there are X or more choices, lower depth. this increases efficiency but decreases chances to get the best result
-        if depth == ALPHA_BETA_DEPTH:
+        if depth == self.root_depth:
             best_move_GLOBAL = choices[0]
             if len(choices) >= MAX_CHOICES:
                 depth -= 1
@@ -134,7 +255,8 @@ class Game(object):
             v = -float("inf")
             best_board = []
             best_choice = []
-            for choice, board in zip(choices, boards):
+            for choice, flips in moves:
+                board = self.applyMove(choice, flips, node, maximizing)
                 board_value = self.alphaBeta(board, depth-1, alpha, beta, 0)[0]
                 if board_value > v:
                     v = board_value
@@ -151,7 +273,8 @@ class Game(object):
             v = float("inf")
             best_board = []
             best_choice = []
-            for choice, board in zip(choices, boards):
+            for choice, flips in moves:
+                board = self.applyMove(choice, flips, node, maximizing)
                 board_value = self.alphaBeta(board, depth-1, alpha, beta, 1)[0]
                 if board_value < v:
                     v = board_value
@@ -163,6 +286,13 @@ class Game(object):
                 beta = min(beta, v)
                 if beta <= alpha:
                     break
+
+        #A search cut short by the clock has no reliable value
+        if time.time() - self.start_time < self.time_budget:
+            if v <= alpha_original: flag = UPPER
+            elif v >= beta_original: flag = LOWER
+            else: flag = EXACT
+            self.tt[key] = (depth, flag, v, transform_move(best_choice, transform))
         '''
         if depth == ALPHA_BETA_DEPTH:
             print("Total nodes: " + str(nodes))
@@ -233,58 +363,64 @@ class Game(object):
 
     def move(self, pos: int, temp_array = None, player = None) -> List:
         '''
-        :param x: 0-indexed coordinate
-        :param y: 0-indexed coordinate
+        :param pos: 0-indexed coordinate
+        :param temp_array: board to play on, self.array if not given
         '''
-        (x, y) = self.convert_pos(pos)
-        
-        if temp_array: array = deepcopy(temp_array)
-        else: array = deepcopy(self.array)
-
+        if not temp_array: temp_array = self.array
         if player == None: player = self.player
-        
-        if player == 1: colour = 'w'
-        else: colour = 'b'
-            
-        
-        array[pos] = colour
 
-        #get neighbours
-        neighbours = self.neighbours_mapping[pos]
-        
-        #which tiles to convert
-        convert = []
-        for neighbour in neighbours:
-            (neighX, neighY) = self.convert_pos(neighbour)
-            
-            if array[neighbour] != colour:
-                path = []
-                
-                #Determine the direction to move in
-                deltaX = neighX - x
-                deltaY = neighY - y
-                tempX = neighX
-                tempY = neighY
-
-                while 0 <= tempX <= 7 and 0 <= tempY <= 7:
-                    temp_pos = self.convert_xy(tempX, tempY)
-                    path.append(temp_pos)
-                    value = array[temp_pos]
-
-                    if value == None:
-                        break
-                
-                    if value == colour:
-                        for node in path:
-                            convert.append(node)
-                        break
+        return self.applyMove(pos, self.getFlips(pos, temp_array, 'w' if player == 1 else 'b'), temp_array, player)
 
-                    tempX += deltaX
-                    tempY += deltaY
+    def getFlips(self, pos: int, board: List, colour: str) -> List:
+        '''
+        returns the discs that colour would flip by playing pos, empty if there are none
+        '''
+        flips = []
+        for ray in RAYS[pos]:
+            first = board[ray[0]]
+            if first == None or first == colour:
+                continue
+
+            for i in range(1, len(ray)):
+                value = board[ray[i]]
+                if value == None:
+                    break
+                if value == colour:
+                    flips.extend(ray[:i])
+                    break
+        return flips
 
-        for node in convert:
-            array[node] = colour
+    def getMovesWithFlips(self, board: List, player: int) -> List:
+        '''
+        Legal moves of self.player (same as getPossibleMoves) along with the discs that player flips by playing them
+        When player is self.player both come out of one walk over the rays
+        :return: list of (pos, flips)
+        '''
+        legal_colour = 'w' if self.player == 1 else 'b'
+        colour = 'w' if player == 1 else 'b'
+
+        moves = []
+        for pos in range(64):
+            if board[pos] != None:
+                continue
+
+            flips = self.getFlips(pos, board, legal_colour)
+            if not flips:
+                continue
+            if colour != legal_colour:
+                flips = self.getFlips(pos, board, colour)
+            moves.append((pos, flips))
+        return moves
 
+    def applyMove(self, pos: int, flips: List, board: List, player: int) -> List:
+        '''
+        returns a copy of board with pos played and flips turned over by player
+        '''
+        colour = 'w' if player == 1 else 'b'
+        array = board[:]
+        array[pos] = colour
+        for node in flips:
+            array[node] = colour
         return array
 
     def scoring(self, board, player:int, weights = None) -> int:
@@ -302,6 +438,11 @@ class Game(object):
             if p: p = 1 if p == 'w' else 0
             if p == player: score += p * w
             elif p == opponent: score -= p * w
+
+        #stable discs are counted properly for both colours
+        (black_stable, white_stable) = stable_discs(board)
+        if player == 1: score += STABILITY_WEIGHT * (black_stable - white_stable)
+        else: score += STABILITY_WEIGHT * (white_stable - black_stable)
         
         return score
 
@@ -310,12 +451,164 @@ class Game(object):
         moves = [pos for pos in range(64) if self.isValid(pos, board)]
         return moves
 
-    def askForAIMove_COMP(self) -> str:
+    def iterativeDeepening(self, soft: float, hard: float, max_depth: int, first_depth: int = 1, report = None) -> Tuple:
+        '''
+        Searches depth first_depth, first_depth + 1, ... until the soft budget is used up
+        An iteration cut off by the hard budget is thrown away
+        If the best move changes between iterations the position is critical and the soft budget is extended
+        :param report: called with (depth, choice, value) after every completed iteration
+        :return: (best choice, deepest completed depth)
+        '''
+        self.root_depth = None
+        self.time_budget = hard
+
+        best_choice = self.getPossibleMoves(self.array)[0]
+        completed = 0
+        for depth in range(first_depth, max_depth + 1):
+            alpha_beta_result = self.alphaBeta(self.array, depth, -float("inf"), float("inf"), 1)
+            elapsed = time.time() - self.start_time
+            if elapsed >= hard: break
+
+            if depth > 1 and alpha_beta_result[2] != best_choice:
+                soft = min(soft * CRITICAL_EXTENSION, hard)
+            best_choice = alpha_beta_result[2]
+            completed = depth
+            if report: report(depth, best_choice, alpha_beta_result[0])
+
+            if elapsed >= soft: break
+
+        self.root_depth = ALPHA_BETA_DEPTH
+        self.time_budget = self.move_time
+        return (best_choice, completed)
+
+    def endgameSearch(self, board: List, player: int, alpha: int, beta: int, passed: bool = False) -> int:
+        '''
+        Exact search to the end of the game, both colours moving in turn
+        :param player: colour to move
+        :return: opponent discs minus player discs at the end, which player wants as high as possible
+        '''
+        self.nodes += 1
+        if time.time() - self.start_time >= self.time_budget:
+            self.timed_out = True
+            return 0
+
+        colour = 'w' if player == 1 else 'b'
+        empties = board.count(None)
+
+        #stable discs stay to the end: own ones cap the result, opponent ones floor it
+        #stability is only worked out when the disc counts leave room for a cutoff
+        if empties > STABILITY_CUTOFF_EMPTIES:
+            own = board.count(colour)
+            opponent = 64 - empties - own
+            if 64 - 2 * own <= alpha or 2 * opponent - 64 >= beta:
+                (black_stable, white_stable) = stable_discs(board)
+                (own_stable, opponent_stable) = (white_stable, black_stable) if player == 1 else (black_stable, white_stable)
+                upper = 64 - 2 * own_stable
+                if upper <= alpha: return upper
+                lower = 2 * opponent_stable - 64
+                if lower >= beta: return lower
+
+        moves = []
+        for pos in range(64):
+            if board[pos] == None:
+                flips = self.getFlips(pos, board, colour)
+                if flips: moves.append((pos, flips))
+
+        if not moves:
+            if passed:
+                opponent = 'b' if player == 1 else 'w'
+                return board.count(opponent) - board.count(colour)
+            return -self.endgameSearch(board, 1 - player, -beta, -alpha, True)
+
+        v = -float("inf")
+        for pos, flips in moves:
+            board_value = -self.endgameSearch(self.applyMove(pos, flips, board, player), 1 - player, -beta, -alpha)
+            v = max(v, board_value)
+            alpha = max(alpha, v)
+            if beta <= alpha:
+                break
+        return v
+
+    def solveEndgame(self, budget: float) -> int:
+        '''
+        Solves the game exactly when few enough squares are empty
+        :param budget: seconds since self.start_time the solve may run for
+        :return: the move that ends the game with the fewest discs, None if not solved in time or too many empties
+        '''
+        if self.array.count(None) > ENDGAME_EMPTIES: return None
+
+        self.timed_out = False
+        self.time_budget = budget
+        colour = 'w' if self.player == 1 else 'b'
+        alpha = -float("inf")
+        best_choice = None
+        for pos in self.getPossibleMoves(self.array):
+            flips = self.getFlips(pos, self.array, colour)
+            board_value = -self.endgameSearch(self.applyMove(pos, flips, self.array, self.player), 1 - self.player, -float("inf"), -alpha)
+            if self.timed_out: break
+            if board_value > alpha:
+                alpha = board_value
+                best_choice = pos
+        self.time_budget = self.move_time
+
+        if self.timed_out:
+            debug_print("Endgame not solved in time")
+            return None
+        debug_print(f"Endgame solved, opponent discs minus ours {alpha}")
+        return best_choice
+
+    def askForAIMove_COMP(self, remaining: float = None, increment: float = 0) -> str:
+        '''
+        :param remaining: seconds left on our clock, if the referee sent it
+        :param increment: seconds added to our clock after every move
+        '''
         #debug_print("HERE")
         self.player = self.static_player
         self.start_time = time.time()
-        alpha_beta_result = self.alphaBeta(self.array, ALPHA_BETA_DEPTH, -float("inf"), float("inf"), 1)
-        return xy_to_alphanum(alpha_beta_result[2])
+        self.nodes = 0
+        self.tt = {}
+
+        self.move_budget = self.move_time
+        self.move_depth = 0
+
+        if remaining is None and not self.smp:
+            #the exact solve goes first, the fixed depth search only runs if it fails
+            best_choice = self.solveEndgame(self.move_time * ENDGAME_SHARE)
+            self.move_depth = self.array.count(None)
+            if best_choice is None:
+                best_choice = self.alphaBeta(self.array, ALPHA_BETA_DEPTH, -float("inf"), float("inf"), 1)[2]
+                self.move_depth = ALPHA_BETA_DEPTH
+            return xy_to_alphanum(best_choice)
+
+        empties = self.array.count(None)
+        if remaining is None: (soft, hard, emergency) = (self.move_time, self.move_time, False)
+        else: (soft, hard, emergency) = allocate_time(remaining, increment, empties)
+        max_depth = 1 if emergency else min(empties, MAX_DEPTH)
+
+        if self.smp and not emergency:
+            #the workers cannot extend their budget, so they get the soft one
+            hard = soft
+        self.move_budget = hard
+
+        choices = self.getPossibleMoves(self.array)
+        if len(choices) == 1:
+            debug_print("Forced move, no search")
+            return xy_to_alphanum(choices[0])
+
+        #the exact solve goes first, the heuristic search gets whatever time it leaves
+        best_choice = None if emergency else self.solveEndgame(hard * ENDGAME_SHARE)
+        if best_choice is not None:
+            depth = empties
+        elif self.smp and not emergency:
+            (best_choice, depth, nodes) = self.smp.search(self.array, self.player, self.start_time, soft, max_depth)
+            self.nodes += nodes
+            if best_choice is None: best_choice = choices[0]
+        else:
+            (best_choice, depth) = self.iterativeDeepening(soft, hard, max_depth)
+
+        self.move_depth = depth
+        debug_print(f"Depth {depth} in {time.time() - self.start_time:.2f}s of {hard:.2f}s" + (" (emergency)" if emergency else ""))
+        return xy_to_alphanum(best_choice)
 
     def getFinalMove_COMP(self, given_move: str, player: int) -> None:
         (x, y) = alphanum_to_xy(given_move[0], given_move[1])
@@ -327,26 +620,66 @@ class Game(object):
 
 
 
-bw = input()
-if bw == 'w': bw = 1
-else: bw = 0
-game = Game(bw)
-
-
-
-print('ok', flush=True)
-
-line = '...'
-
-while line and line != 'done':
-  line = input()
-  if line == 'get move':
-    move = game.askForAIMove_COMP()
-    print(move, flush=True)
-  elif line[:4] == 'move':
-    temp_player = 1 if line[5] == 'w' else 0
-    move = line[7:9]
-    game.getFinalMove_COMP(move, temp_player)
-
-  else:
-    pass
+if __name__ == '__main__':
+  PROFILE_DIR = get_option('--profile', PROFILE_DIR)
+  profiler = None
+  if PROFILE_DIR:
+    from profiling import MoveProfiler
+    profiler = MoveProfiler(PROFILE_DIR)
+    debug_print(f"Profiling searches into {PROFILE_DIR}")
+
+  LOG_PATH = get_option('--log', LOG_PATH)
+
+  bw = input()
+  if bw == 'w': bw = 1
+  else: bw = 0
+  game = Game(bw)
+
+  SMP_WORKERS = get_option('--smp', SMP_WORKERS)
+  if SMP_WORKERS:
+    from lazy_smp import LazySMP
+    game.smp = LazySMP(int(SMP_WORKERS))
+    debug_print(f"Searching with {SMP_WORKERS} Lazy-SMP workers")
+
+  game_log = None
+  if LOG_PATH:
+    from game_log import GameLogWriter
+    game_log = GameLogWriter(LOG_PATH, bw, ALPHA_BETA_DEPTH, ALPHA_BETA_DEPTH_PLAYER_2, MAX_CHOICES, TIME_ALLOWED)
+
+  #(move, seconds, nodes, budget, depth) of the last search, logged once the referee confirms the move
+  searched = None
+
+  print('ok', flush=True)
+
+  line = '...'
+
+  try:
+    while line and line != 'done':
+      line = input()
+      if line[:8] == 'get move':
+        #optional clock extension: get move <remaining> [<increment>]
+        clock = [float(i) for i in line[8:].split()]
+        start = time.time()
+        if profiler: move = profiler.run(game.askForAIMove_COMP, *clock)
+        else: move = game.askForAIMove_COMP(*clock)
+        searched = (move, time.time() - start, game.nodes, game.move_budget, game.move_depth)
+        print(move, flush=True)
+      elif line[:4] == 'move':
+        temp_player = 1 if line[5] == 'w' else 0
+        move = line[7:9]
+        game.getFinalMove_COMP(move, temp_player)
+
+        if game_log:
+          (x, y) = alphanum_to_xy(move[0], move[1])
+          if searched and searched[0] == move and temp_player == bw:
+            game_log.record_move(game.convert_xy(x, y), temp_player, *searched[1:])
+          else:
+            game_log.record_move(game.convert_xy(x, y), temp_player)
+          searched = None
+
+      else:
+        pass
+  finally:
+    if profiler: profiler.write_summary()
+    if game_log: game_log.close()
+    if game.smp: game.smp.close()
@@ -102,6 +102,7 @@ class Game(object):
             [51, 58, 60, 50, 52], [52, 59, 61, 51, 53], [53, 60, 62, 52, 54], [54, 61, 63, 53, 55], [55, 62, 54]
         ]
 
+        self.nodes = 0
 
         
 
@@ -110,6 +111,7 @@ class Game(object):
         maximizing = 0 gets best result for black
         maximizing = 1 gets best result for white
         '''
+        self.nodes += 1
 
         choices = self.getPossibleMoves(node)
         boards = [self.move(i, node, maximizing) for i in choices] #ALSO TRY WITHOUT PUTTING MAXIMIZNG IN THERE THATS WHAT I DID BEFORE LOLZERS
@@ -355,11 +357,18 @@ class Game(object):
 
         print("Game Over", flush = True)
 
-    def playGame_AI(self):
-        
+    def playGame_AI(self, log_path = None):
+        '''
+        :param log_path: if given, the game is appended to this binary game log
+        '''
         black_overtime = 0
         white_overtime = 0
 
+        game_log = None
+        if log_path:
+            from game_log import GameLogWriter, SIDE_BOTH
+            game_log = GameLogWriter(log_path, SIDE_BOTH, ALPHA_BETA_DEPTH, ALPHA_BETA_DEPTH_PLAYER_2, MAX_CHOICES, 1)
+
         while not self.won:
             print ('_______________Moves: {}________________'.format(self.moves), flush = True)
             print(self, flush = True)
@@ -381,6 +390,7 @@ class Game(object):
                 self.passed = False
 
             start_time = time.time()
+            self.nodes = 0
 
             if self.player == 0:
                 
@@ -398,10 +408,15 @@ class Game(object):
                 if elapsed_time > 1: white_overtime += 1
             
             print("Elapsed Time: {}".format(hms_string(elapsed_time)), flush = True)
+            if game_log:
+                depth = ALPHA_BETA_DEPTH if self.player == 0 else ALPHA_BETA_DEPTH_PLAYER_2
+                game_log.record_move(alpha_beta_result[2], self.player, elapsed_time, self.nodes, 1, depth)
             #sleep(15)
             self.player = 1 - self.player
             self.moves += 1
 
+        if game_log: game_log.close()
+
         print("Game Over", flush = True)
         print('\n\n', flush = True)
         print('Black over time: ' + str(black_overtime), flush = True)
@@ -417,7 +432,7 @@ class Game(object):
         (x, y) = alphanum_to_xy(given_move[0], given_move[1])
         pos = self.convert_xy(x, y)
         self.player = player
-        self.array = self.move((pos)
+        self.array = self.move(pos)
     
     def __str__(self):
         temp = reshape(self.array, 8, 8)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+'''
+Search performance benchmark
+
+Runs alphaBeta and askForAIMove_COMP over the fixed positions in benchmark_positions.json and measures
+time to each depth, nodes per second, peak memory and the best move found.
+Results can be saved as a JSON baseline and later runs compared against it.
+
+usage: benchmark.py [--depth N] [--repeat N] [--save FILE] [--compare FILE] [--threshold F]
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from anti_othello_COMP import Game, xy_to_alphanum
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_positions.json')
+
+BENCH_DEPTH = 5
+REPEAT = 3
+
+#relative change that counts as a regression rather than noise
+NOISE_THRESHOLD = .1
+
+#timings shorter than this in both runs are too noisy to compare
+MIN_TIME = .01
+
+def load_positions(path: str = POSITIONS_FILE) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+def new_game(position: Dict) -> Game:
+    '''
+    Game set up on the position, searching a fixed depth with no time limit
+    '''
+    game = Game(position['player'])
+    game.array = [None if p == '.' else p for p in position['board']]
+    game.time_budget = float("inf")
+    game.root_depth = None
+    return game
+
+def search_to_depth(position: Dict, max_depth: int) -> Dict:
+    '''
+    Searches depth 1 to max_depth the way iterativeDeepening does and times each depth
+    '''
+    game = new_game(position)
+    depth_times = []
+    start = time.perf_counter()
+    for depth in range(1, max_depth + 1):
+        alpha_beta_result = game.alphaBeta(game.array, depth, -float("inf"), float("inf"), 1)
+        depth_times.append(time.perf_counter() - start)
+
+    return {
+        'depth_times': depth_times,
+        'nodes': game.nodes,
+        'best_move': xy_to_alphanum(alpha_beta_result[2]),
+    }
+
+def peak_memory(position: Dict, max_depth: int) -> int:
+    '''
+    Peak bytes allocated while searching to max_depth, measured in a separate run as tracemalloc slows the search down
+    '''
+    tracemalloc.start()
+    search_to_depth(position, max_depth)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def comp_move(position: Dict) -> Dict:
+    '''
+    The move the referee would get from a plain 'get move', and how long it took
+    The search runs with no time limit, so the move does not depend on how loaded the machine is
+    '''
+    game = Game(position['player'])
+    game.array = [None if p == '.' else p for p in position['board']]
+    game.move_time = float("inf")
+    game.time_budget = game.move_time
+    start = time.perf_counter()
+    move = game.askForAIMove_COMP()
+    return {'comp_move': move, 'comp_time': time.perf_counter() - start}
+
+def run(depth: int, repeat: int) -> Dict:
+    positions = load_positions()
+    results = {}
+    for position in positions['positions']:
+        max_depth = min(depth, position['board'].count('.'))
+
+        #the fastest of several runs is the least noisy
+        runs = [search_to_depth(position, max_depth) for i in range(repeat)]
+        result = min(runs, key=lambda r: r['depth_times'][-1])
+        result['nps'] = result['nodes'] / result['depth_times'][-1]
+        result['peak_memory'] = peak_memory(position, max_depth)
+        result.update(min((comp_move(position) for i in range(repeat)), key=lambda r: r['comp_time']))
+
+        results[position['name']] = result
+        print(f"{position['name']:<14} depth {max_depth} in {result['depth_times'][-1]:.3f}s, "
+              f"{result['nps']:.0f} nodes/s, {result['peak_memory'] / 1024:.0f} KiB, "
+              f"best {result['best_move']}, get move {result['comp_move']} in {result['comp_time']:.3f}s", flush=True)
+
+    return {
+        'positions_version': positions['version'],
+        'depth': depth,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List:
+    '''
+    :return: one line per regression or changed move
+    '''
+    if baseline['positions_version'] != current['positions_version'] or baseline['depth'] != current['depth']:
+        return ['Baseline was taken with different positions or depth, nothing to compare']
+
+    regressions = []
+    for name, new in current['results'].items():
+        old = baseline['results'].get(name)
+        if not old: continue
+
+        #(metric, old, new, higher is better)
+        for metric, before, after, higher_better in (
+            ('time to depth', old['depth_times'][-1], new['depth_times'][-1], False),
+            ('nodes/s', old['nps'], new['nps'], True),
+            ('peak memory', old['peak_memory'], new['peak_memory'], False),
+            ('get move time', old['comp_time'], new['comp_time'], False),
+        ):
+            if 'time' in metric and before < MIN_TIME and after < MIN_TIME: continue
+            change = (after - before) / before if before else 0
+            if (change < -threshold) if higher_better else (change > threshold):
+                regressions.append(f'{name}: {metric} {before:.4g} -> {after:.4g} ({change * 100:+.1f}%)')
+
+        if old['best_move'] != new['best_move']:
+            regressions.append(f"{name}: best move {old['best_move']} -> {new['best_move']}")
+        if old['comp_move'] != new['comp_move']:
+            regressions.append(f"{name}: get move {old['comp_move']} -> {new['comp_move']}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the search on a fixed set of positions')
+    parser.add_argument('--depth', type=int, default=BENCH_DEPTH)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--save', help='write the results to this baseline file')
+    parser.add_argument('--compare', help='baseline file to compare against')
+    parser.add_argument('--threshold', type=float, default=NOISE_THRESHOLD, help='relative change treated as noise')
+    args = parser.parse_args()
+
+    current = run(args.depth, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        results = current['results']
+        agreement = sum(results[n]['best_move'] == baseline['results'].get(n, {}).get('best_move') for n in results)
+        print(f'\nBest move agreement with baseline: {agreement}/{len(results)}')
+
+        regressions = compare(baseline, current, args.threshold)
+        for line in regressions:
+            print(line)
+        if regressions: sys.exit(1)
+        print(f'No regressions beyond {args.threshold * 100:.0f}%')
+
+if __name__ == '__main__':
+    main()
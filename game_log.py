@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+'''
+Append-only binary game log
+
+Every game is buffered while it is played and appended as one record with a single O_APPEND write,
+so several engines can share one log file without their games interleaving
+
+Every record starts with:
+    0x80 marker, b'AOG', version, payload length (uint32), payload crc32 (uint32)
+and the payload holds a header:
+    side, depth, depth player 2, max choices, time allowed (float)
+side is 0 for black, 1 for white and 2 when the engine plays both colours (playGame_AI)
+
+followed by the moves, each a single byte:
+    bit 7    always 0
+    bit 6    colour that moved (1 for white)
+    bits 0-5 0-indexed position
+Moves played by the engine are followed by the search time in ms (uint16), node count (uint32),
+the time the engine was allowed for that move in ms (uint16) and the depth it completed (uint8)
+'''
+
+import os
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+GAME_MARKER = 0x80
+MAGIC = b'AOG'
+VERSION = 4
+
+SIDE_BOTH = 2
+
+RECORD = struct.Struct('<B3sBII')
+HEADER = struct.Struct('<BBBBf')
+ENGINE_STATS = struct.Struct('<HIHB')
+
+def encode_move(pos: int, player: int) -> int:
+    return (player << 6) | pos
+
+def decode_move(byte: int) -> Tuple:
+    '''
+    returns (pos, player)
+    '''
+    return (byte & 0x3F, (byte >> 6) & 1)
+
+def is_engine_move(side: int, player: int) -> bool:
+    return side == SIDE_BOTH or side == player
+
+class GameLogWriter(object):
+    def __init__(self, path: str, side: int, depth: int, depth_player_2: int, max_choices: int, time_allowed: float):
+        '''
+        Starts a new game, which is written to path by close()
+        '''
+        self.path = path
+        self.side = side
+        self.payload = bytearray(HEADER.pack(side, depth, depth_player_2, max_choices, time_allowed))
+
+    def record_move(self, pos: int, player: int, seconds: float = 0, nodes: int = 0, budget: float = 0, depth: int = 0) -> None:
+        '''
+        seconds, nodes, budget (seconds allowed for the search) and depth (deepest search completed, 0 if none)
+        are only stored for moves played by the engine
+        '''
+        self.payload.append(encode_move(pos, player))
+        if is_engine_move(self.side, player):
+            ms = min(int(seconds * 1000), 0xFFFF)
+            budget_ms = min(int(budget * 1000), 0xFFFF)
+            self.payload += ENGINE_STATS.pack(ms, min(nodes, 0xFFFFFFFF), budget_ms, min(depth, 0xFF))
+
+    def close(self) -> None:
+        '''
+        Appends the game as one record, in a single write so records from other writers cannot land inside it
+        '''
+        record = RECORD.pack(GAME_MARKER, MAGIC, VERSION, len(self.payload), zlib.crc32(self.payload)) + self.payload
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+
+def parse_game(payload: bytes) -> Dict:
+    '''
+    Decodes the payload of one record, raises ValueError or struct.error if it is damaged
+    '''
+    (side, depth, depth_player_2, max_choices, time_allowed) = HEADER.unpack_from(payload, 0)
+    game = {
+        'side': side,
+        'depth': depth,
+        'depth_player_2': depth_player_2,
+        'max_choices': max_choices,
+        'time_allowed': time_allowed,
+        'moves': [],
+    }
+
+    i = HEADER.size
+    while i < len(payload):
+        byte = payload[i]
+        i += 1
+        if byte & GAME_MARKER:
+            raise ValueError(f'Unexpected byte {byte:#04x}')
+
+        (pos, player) = decode_move(byte)
+        ms = nodes = budget_ms = depth = None
+        if is_engine_move(side, player):
+            (ms, nodes, budget_ms, depth) = ENGINE_STATS.unpack_from(payload, i)
+            i += ENGINE_STATS.size
+        game['moves'].append({'pos': pos, 'player': player, 'ms': ms, 'nodes': nodes, 'budget_ms': budget_ms, 'depth': depth})
+    return game
+
+def read_games(f: BinaryIO) -> Iterator[Dict]:
+    '''
+    Yields every game in a log as a dict with the header fields and a list of moves
+    Each move is a dict of pos, player, ms, nodes, budget_ms and depth (all but pos and player are None for opponent moves)
+    A damaged or truncated record is skipped and reading carries on from the next record marker
+    '''
+    data = f.read()
+    record_start = bytes([GAME_MARKER]) + MAGIC
+    i = data.find(record_start)
+    while i != -1:
+        try:
+            (marker, magic, version, length, crc) = RECORD.unpack_from(data, i)
+            payload = data[i + RECORD.size:i + RECORD.size + length]
+            #a record cut short by a crash runs into the next one and fails the crc
+            if version != VERSION or len(payload) != length or zlib.crc32(payload) != crc:
+                raise ValueError(f'Bad record at byte {i}')
+            game = parse_game(payload)
+        except (ValueError, struct.error):
+            i = data.find(record_start, i + 1)
+            continue
+
+        yield game
+        i = data.find(record_start, i + RECORD.size + length)
+
+def read_log(path: str) -> List[Dict]:
+    with open(path, 'rb') as f:
+        return list(read_games(f))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+'''
+Lazy-SMP search
+
+Worker processes all search the same root with iterative deepening, half of them one ply deeper,
+and share one transposition table that lives in shared memory
+Nothing is locked: every entry stores key ^ data next to data, so a torn write fails validation and is ignored
+The main process plays the move of the deepest iteration completed within the budget,
+returning early once an iteration reaches the maximum depth or every worker has finished
+'''
+
+import struct
+import time
+import queue
+from multiprocessing import Process, Queue
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple
+
+from anti_othello_COMP import Game
+
+TT_ENTRIES = 1 << 18
+
+ENTRY = struct.Struct('<QQ')
+MASK_64 = (1 << 64) - 1
+MASK_32 = (1 << 32) - 1
+
+class SharedTT(object):
+    def __init__(self, entries: int = TT_ENTRIES, name: str = None):
+        '''
+        Creates the table, or attaches to an existing one when name is given
+        Drop-in for the dict in Game.tt: supports get(key) and tt[key] = (depth, flag, value, choice)
+        '''
+        self.entries = entries
+        if name: self.memory = SharedMemory(name=name)
+        else: self.memory = SharedMemory(create=True, size=entries * ENTRY.size)
+        self.buffer = self.memory.buf
+
+    def __reduce__(self):
+        return (SharedTT, (self.entries, self.memory.name))
+
+    def get(self, key):
+        key = hash(key) & MASK_64
+        (check, data) = ENTRY.unpack_from(self.buffer, key % self.entries * ENTRY.size)
+        if check ^ data != key: return None
+
+        value = data & MASK_32
+        if value >= 1 << 31: value -= 1 << 32
+        return ((data >> 32) & 0xFF, (data >> 40) & 0x3, value, (data >> 48) & 0x3F)
+
+    def __setitem__(self, key, entry: Tuple) -> None:
+        key = hash(key) & MASK_64
+        (depth, flag, value, choice) = entry
+        data = (int(value) & MASK_32) | (min(depth, 0xFF) << 32) | (flag << 40) | (choice << 48)
+        ENTRY.pack_into(self.buffer, key % self.entries * ENTRY.size, key ^ data, data)
+
+    def close(self) -> None:
+        self.buffer = None
+        self.memory.close()
+
+def worker(index: int, tt: SharedTT, jobs: Queue, results: Queue) -> None:
+    '''
+    Searches every job it is given until the job's deadline, reporting each completed iteration
+    as (job_id, index, depth, choice, value, nodes) and then (job_id, index, None, None, None, nodes) when done
+    '''
+    while True:
+        job = jobs.get()
+        if job is None: break
+        (job_id, array, player, start_time, budget, max_depth) = job
+
+        game = Game(player)
+        game.array = array
+        game.tt = tt
+        game.start_time = start_time
+
+        #stagger the depths so the workers fill the table for each other
+        first_depth = min(1 + index % 2, max_depth)
+        report = lambda depth, choice, value: results.put((job_id, index, depth, choice, value, game.nodes))
+        game.iterativeDeepening(budget, budget, max_depth, first_depth, report)
+        results.put((job_id, index, None, None, None, game.nodes))
+
+    tt.close()
+
+class LazySMP(object):
+    def __init__(self, workers: int, entries: int = TT_ENTRIES):
+        '''
+        Starts the worker processes, which live until close()
+        '''
+        self.tt = SharedTT(entries)
+        self.results = Queue()
+        self.jobs = []
+        self.processes = []
+        self.job_id = 0
+
+        for index in range(workers):
+            jobs = Queue()
+            process = Process(target=worker, args=(index, self.tt, jobs, self.results), daemon=True)
+            process.start()
+            self.jobs.append(jobs)
+            self.processes.append(process)
+
+    def search(self, array: List, player: int, start_time: float, budget: float, max_depth: int) -> Tuple:
+        '''
+        :return: (best choice, depth, nodes) of the deepest iteration any worker completed within the budget,
+                 (None, 0, nodes) if none did, nodes being the total the workers have reported
+        '''
+        self.job_id += 1
+        for jobs in self.jobs:
+            jobs.put((self.job_id, array, player, start_time, budget, max_depth))
+
+        best_choice = None
+        best_depth = 0
+        #latest node count of each worker, and the workers that are done
+        nodes = {}
+        done = set()
+        deadline = start_time + budget
+        while best_depth < max_depth and len(done) < len(self.jobs):
+            remaining = deadline - time.time()
+            if remaining <= 0: break
+            try:
+                (job_id, index, depth, choice, value, worker_nodes) = self.results.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            #results of earlier moves that arrive late are ignored
+            if job_id != self.job_id: continue
+            nodes[index] = worker_nodes
+            if depth is None: done.add(index)
+            elif depth > best_depth:
+                best_choice = choice
+                best_depth = depth
+
+        return (best_choice, best_depth, sum(nodes.values()))
+
+    def close(self) -> None:
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive(): process.terminate()
+
+        self.tt.close()
+        self.tt.memory.unlink()
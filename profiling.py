@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import os
+import cProfile
+import pstats
+import json
+from typing import Callable, Dict
+
+#Functions whose share of the search time is reported separately in the summary
+SPLIT_FUNCTIONS = ('isValid', 'getMovesWithFlips', 'applyMove', 'move', 'scoring')
+
+TOP_FUNCTIONS = 25
+
+class MoveProfiler(object):
+    def __init__(self, directory: str):
+        '''
+        Profiles every search it is asked to run and writes one dump per move
+        :param directory: folder for move_XXX.prof dumps and the game summary
+        '''
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.dumps = []
+        self.move_times = []
+
+    def run(self, func: Callable, *args):
+        '''
+        Calls func(*args) under cProfile and dumps the stats for that move
+        '''
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func, *args)
+
+        path = os.path.join(self.directory, 'move_{:03d}.prof'.format(len(self.dumps) + 1))
+        profiler.dump_stats(path)
+        self.dumps.append(path)
+        self.move_times.append(pstats.Stats(profiler).total_tt)
+
+        return result
+
+    def split(self, stats: pstats.Stats) -> Dict:
+        '''
+        Cumulative time spent in each of SPLIT_FUNCTIONS
+        '''
+        split = {name: 0.0 for name in SPLIT_FUNCTIONS}
+        for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+            if name in split:
+                split[name] += ct
+        return split
+
+    def write_summary(self) -> None:
+        '''
+        Merges every per-move dump into summary.prof, summary.txt and summary.json
+        '''
+        if not self.dumps: return
+
+        stats = pstats.Stats(*self.dumps)
+        stats.dump_stats(os.path.join(self.directory, 'summary.prof'))
+
+        total = stats.total_tt
+        split = self.split(stats)
+
+        with open(os.path.join(self.directory, 'summary.txt'), 'w') as f:
+            f.write('Moves profiled: {}\n'.format(len(self.dumps)))
+            f.write('Total search time: {:.3f}s\n'.format(total))
+            f.write('Slowest move: {:.3f}s\n\n'.format(max(self.move_times)))
+            for name, seconds in split.items():
+                share = seconds / total * 100 if total else 0
+                f.write('{:<18} {:>8.3f}s {:>6.1f}%\n'.format(name, seconds, share))
+            f.write('\n')
+
+            stats.stream = f
+            stats.sort_stats('tottime').print_stats(TOP_FUNCTIONS)
+
+        with open(os.path.join(self.directory, 'summary.json'), 'w') as f:
+            json.dump({
+                'moves': len(self.dumps),
+                'total_time': total,
+                'move_times': self.move_times,
+                'split': split,
+            }, f, indent=2)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+'''
+Re-searches every engine move recorded in binary game logs deeper than the engine searched it, in parallel,
+and flags blunders and moves that overran the time budget
+
+usage: replay_analyzer.py LOG [LOG ...] [--extra N] [--depth N] [--jobs N] [--blunder N] [--json FILE]
+'''
+
+import argparse
+import json
+import time
+from multiprocessing import Pool, cpu_count
+from typing import Dict, List, Tuple
+
+import anti_othello_COMP as engine
+from anti_othello_COMP import Game, xy_to_alphanum, hms_string
+from game_log import read_log, is_engine_move
+from symmetry import canonical, from_canonical, transform_move, untransform_move
+
+#plies searched beyond the depth recorded for the move
+REPLAY_EXTRA_DEPTH = 2
+#depth for moves logged without one, such as forced moves
+REPLAY_DEPTH = engine.ALPHA_BETA_DEPTH + REPLAY_EXTRA_DEPTH
+BLUNDER_THRESHOLD = 20
+
+#a search stops once it has reached its budget, so it always ends a few ms past it
+#only going over by more than the larger of these counts as an overrun
+OVERRUN_MARGIN_MS = 10
+OVERRUN_MARGIN_SHARE = .02
+
+def collect_positions(paths: List[str]) -> List[Dict]:
+    '''
+    Replays every game and returns the position before each engine move
+    '''
+    positions = []
+    for path in paths:
+        for game_index, game in enumerate(read_log(path)):
+            board = Game(0).array
+            for ply, move in enumerate(game['moves']):
+                if is_engine_move(game['side'], move['player']):
+                    positions.append({
+                        'log': path,
+                        'game': game_index,
+                        'ply': ply,
+                        'player': move['player'],
+                        'board': board,
+                        'played': move['pos'],
+                        'ms': move['ms'],
+                        'nodes': move['nodes'],
+                        #each move carries its own budget, clock mode gives every move a different one
+                        'budget_ms': move['budget_ms'] or game['time_allowed'] * 1000,
+                        'depth': move['depth'],
+                    })
+                board = Game(move['player']).move(move['pos'], board, move['player'])
+    return positions
+
+def overran(ms: int, budget_ms: float) -> bool:
+    return ms > budget_ms + max(OVERRUN_MARGIN_MS, budget_ms * OVERRUN_MARGIN_SHARE)
+
+def analyse(job) -> Tuple:
+    '''
+    Searches the position the same way askForAIMove_COMP does, only deeper,
+    and scores the move that was actually played against the best one
+    :return: (best move, value lost by the played move, nodes searched)
+    '''
+    (board, player, played, depth) = job
+    game = Game(player)
+
+    #fixed depth with no time limit and no root depth lowering
+    game.time_budget = float("inf")
+    game.root_depth = None
+
+    best = game.alphaBeta(board, depth, -float("inf"), float("inf"), 1)
+    played_board = game.move(played, board, 1)
+    played_value = game.alphaBeta(played_board, depth - 1, -float("inf"), float("inf"), 1)[0]
+
+    #the root of askForAIMove_COMP minimizes, so a higher value is worse
+    return (best[2] if len(best) > 2 else None, played_value - best[0], game.nodes)
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-search recorded games and flag blunders and overruns')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--extra', type=int, default=REPLAY_EXTRA_DEPTH, help='plies beyond the depth the engine completed')
+    parser.add_argument('--depth', type=int, default=REPLAY_DEPTH, help='depth for moves logged without a depth')
+    parser.add_argument('--jobs', type=int, default=cpu_count())
+    parser.add_argument('--blunder', type=int, default=BLUNDER_THRESHOLD, help='value loss that counts as a blunder')
+    parser.add_argument('--json', help='write every analysed move to this file')
+    args = parser.parse_args()
+
+    positions = collect_positions(args.logs)
+
+    #symmetric positions where the same (mapped) move was played are searched once, in canonical form
+    jobs = set()
+    not_deeper = 0
+    for position in positions:
+        depth = position['depth'] + args.extra if position['depth'] else args.depth
+        #no search goes past the end of the game
+        depth = min(depth, position['board'].count(None))
+        position['replay_depth'] = depth
+        if position['depth'] and depth <= position['depth']:
+            #the engine already searched this move as deep as the replay could, re-searching it proves nothing
+            position['key'] = None
+            not_deeper += 1
+            continue
+
+        (key, transform) = canonical(position['board'])
+        position['key'] = (key, position['player'], transform_move(position['played'], transform), depth)
+        position['transform'] = transform
+        jobs.add(position['key'])
+    jobs = list(jobs)
+
+    start = time.time()
+    with Pool(args.jobs) as pool:
+        searched = pool.map(analyse, [(from_canonical(key), player, played, depth) for (key, player, played, depth) in jobs], chunksize=4)
+    searched = dict(zip(jobs, searched))
+    searched[None] = (None, 0, 0)
+
+    results = []
+    for position in positions:
+        (best, loss, replay_nodes) = searched[position['key']]
+        if best is not None:
+            best = untransform_move(best, position['transform'])
+        results.append({
+            'log': position['log'],
+            'game': position['game'],
+            'ply': position['ply'],
+            'player': 'w' if position['player'] else 'b',
+            'played': xy_to_alphanum(position['played']),
+            'best': xy_to_alphanum(best) if best is not None else None,
+            'loss': loss,
+            'ms': position['ms'],
+            'budget_ms': position['budget_ms'],
+            'overran': overran(position['ms'], position['budget_ms']),
+            'depth': position['depth'],
+            'replay_depth': position['replay_depth'],
+            'nodes': position['nodes'],
+            'replay_nodes': replay_nodes,
+        })
+
+    blunders = 0
+    overruns = 0
+    for r in results:
+        r['blunder'] = r['loss'] >= args.blunder
+        blunders += r['blunder']
+        overruns += r['overran']
+        if r['blunder'] or r['overran']:
+            flags = []
+            if r['blunder']: flags.append(f"blunder (best {r['best']}, loss {r['loss']})")
+            if r['overran']: flags.append(f"overran ({r['ms']} of {r['budget_ms']:.0f} ms)")
+            print(f"{r['log']} game {r['game']} ply {r['ply']} {r['player']} {r['played']}: {', '.join(flags)}")
+
+    print(f"{len(results) - not_deeper} moves ({len(jobs)} distinct positions) analysed {args.extra} plies deeper than the engine "
+          f"in {hms_string(time.time() - start)}: {blunders} blunders, {overruns} over time")
+    if not_deeper:
+        print(f"{not_deeper} moves were searched to the end of the game by the engine and not re-searched")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
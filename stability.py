@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+'''
+Stable disc calculator
+
+A stable disc can never be flipped again, so in anti-othello it is a permanent liability
+Discs on the edges are looked up in a table of every edge configuration,
+then interior discs are stable if along each of the 4 lines through them the line is full
+or they touch a wall or a stable disc of their own colour
+Boards are handled as (black, white) bitboards, see symmetry.to_bitboards
+'''
+
+from typing import List, Tuple
+
+from symmetry import to_bitboards
+
+FULL = (1 << 64) - 1
+A_FILE = 0x0101010101010101
+H_FILE = 0x8080808080808080
+NOT_A_FILE = FULL ^ A_FILE
+NOT_H_FILE = FULL ^ H_FILE
+
+EDGE = 0xff818181818181ff
+
+def _edge_index(line: List) -> int:
+    '''
+    :param line: 8 cells, 0 empty, 1 black, 2 white
+    '''
+    index = 0
+    for i in range(7, -1, -1):
+        index = index * 3 + line[i]
+    return index
+
+def _play_line(line: List, pos: int, colour: int) -> List:
+    '''
+    Plays colour at pos and flips along the line only
+    '''
+    line = line[:]
+    line[pos] = colour
+    for delta in (-1, 1):
+        i = pos + delta
+        while 0 <= i <= 7 and line[i] == 3 - colour:
+            i += delta
+        if 0 <= i <= 7 and line[i] == colour:
+            j = pos + delta
+            while j != i:
+                line[j] = colour
+                j += delta
+    return line
+
+def _edge_table() -> List:
+    '''
+    EDGE_STABLE[index] is the 8-bit mask of discs that stay put whatever is played on the empty squares of the line,
+    by either colour and whether or not it flips anything along the line (it may flip in another direction)
+    '''
+    table = [None] * 3 ** 8
+
+    def stable(line: List) -> int:
+        index = _edge_index(line)
+        if table[index] is None:
+            mask = sum(1 << i for i in range(8) if line[i])
+            for pos in range(8):
+                if line[pos]: continue
+                for colour in (1, 2):
+                    after = _play_line(line, pos, colour)
+                    mask &= stable(after) & ~sum(1 << i for i in range(8) if line[i] != after[i])
+            table[index] = mask
+        return table[index]
+
+    for index in range(3 ** 8):
+        line = [index // 3 ** i % 3 for i in range(8)]
+        stable(line)
+    return table
+
+EDGE_STABLE = _edge_table()
+
+#BASE_3[byte] is the edge index of a line holding discs of one colour where byte has bits set
+BASE_3 = [sum(3 ** i for i in range(8) if byte >> i & 1) for byte in range(256)]
+
+#COLUMN[byte] spreads byte down the a-file, COLUMN_GATHER does the reverse
+COLUMN = [sum(1 << 8 * i for i in range(8) if byte >> i & 1) for byte in range(256)]
+COLUMN_GATHER = 0x0102040810204080
+
+#every line through the board in each of the 4 directions, as masks
+def _lines() -> List:
+    horizontal = [0xff << 8 * y for y in range(8)]
+    vertical = [0x0101010101010101 << x for x in range(8)]
+    diagonal = []
+    anti_diagonal = []
+    for k in range(-7, 8):
+        diagonal.append(sum(1 << (x + 8 * (x - k)) for x in range(8) if 0 <= x - k <= 7))
+        anti_diagonal.append(sum(1 << (x + 8 * (k + 7 - x)) for x in range(8) if 0 <= k + 7 - x <= 7))
+    return [horizontal, vertical, diagonal, anti_diagonal]
+
+LINES = _lines()
+
+def _full_lines(occupied: int) -> List:
+    '''
+    For each direction, the squares whose line in that direction is full
+    '''
+    return [sum(line for line in lines if occupied & line == line) for lines in LINES]
+
+def _neighbours(bits: int, direction: int) -> int:
+    '''
+    Squares next to bits on either side along direction (0 horizontal, 1 vertical, 2 diagonal, 3 anti diagonal)
+    Squares on the board edge count as next to the wall
+    '''
+    if direction == 0:
+        return ((bits << 1) & NOT_A_FILE) | (bits >> 1 & NOT_H_FILE) | A_FILE | H_FILE
+    if direction == 1:
+        return (bits << 8 | bits >> 8 | 0xff | 0xff << 56) & FULL
+    if direction == 2:
+        return (((bits << 9) & NOT_A_FILE) | (bits >> 9 & NOT_H_FILE) | EDGE) & FULL
+    return (((bits << 7) & NOT_H_FILE) | (bits >> 7 & NOT_A_FILE) | EDGE) & FULL
+
+def stable_bitboards(black: int, white: int) -> Tuple:
+    '''
+    :return: (stable black discs, stable white discs) as bitboards
+    '''
+    occupied = black | white
+
+    #every stable disc is on an edge or on a full line, which reaches an edge
+    if not occupied & EDGE: return (0, 0)
+
+    full = _full_lines(occupied)
+
+    #edges: top and bottom rows, then the a and h files gathered into a byte
+    stable = EDGE_STABLE[BASE_3[black & 0xff] + 2 * BASE_3[white & 0xff]]
+    stable |= EDGE_STABLE[BASE_3[black >> 56] + 2 * BASE_3[white >> 56]] << 56
+    for x in (0, 7):
+        column_black = ((black >> x & A_FILE) * COLUMN_GATHER & FULL) >> 56
+        column_white = ((white >> x & A_FILE) * COLUMN_GATHER & FULL) >> 56
+        stable |= COLUMN[EDGE_STABLE[BASE_3[column_black] + 2 * BASE_3[column_white]]] << x
+
+    stable_black = stable & black
+    stable_white = stable & white
+
+    while True:
+        new_black = black & ~stable_black
+        new_white = white & ~stable_white
+        for direction in range(4):
+            new_black &= full[direction] | _neighbours(stable_black, direction)
+            new_white &= full[direction] | _neighbours(stable_white, direction)
+        if not new_black and not new_white: break
+        stable_black |= new_black
+        stable_white |= new_white
+
+    return (stable_black, stable_white)
+
+def stable_discs(board: List) -> Tuple:
+    '''
+    :param board: array of a board
+    :return: (number of stable black discs, number of stable white discs)
+    '''
+    (black, white) = stable_bitboards(*to_bitboards(board))
+    return (bin(black).count('1'), bin(white).count('1'))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+'''
+Maps positions to a canonical form under the 8 symmetries of the board
+
+A position is keyed by its black and white bitboards (bit i is square i)
+The canonical key is the smallest key over all 8 transforms, so symmetric positions share one key
+Transforms are applied with precomputed per-row lookup tables, 16 lookups per transform
+'''
+
+from typing import List, Tuple
+
+IDENTITY = 0
+
+def _transform_xy(t: int, x: int, y: int) -> Tuple:
+    if t == 0: return (x, y)
+    if t == 1: return (7 - y, x)          #rotate 90
+    if t == 2: return (7 - x, 7 - y)      #rotate 180
+    if t == 3: return (y, 7 - x)          #rotate 270
+    if t == 4: return (7 - x, y)          #mirror left-right
+    if t == 5: return (x, 7 - y)          #mirror top-bottom
+    if t == 6: return (y, x)              #main diagonal
+    return (7 - y, 7 - x)                 #anti diagonal
+
+#PERMUTATIONS[t][pos] is where transform t sends pos
+PERMUTATIONS = [[_transform_xy(t, pos % 8, pos // 8)[0] + 8 * _transform_xy(t, pos % 8, pos // 8)[1] for pos in range(64)] for t in range(8)]
+
+#INVERSE[t] is the transform that undoes t
+INVERSE = [next(u for u in range(8) if all(PERMUTATIONS[u][PERMUTATIONS[t][pos]] == pos for pos in range(64))) for t in range(8)]
+
+def _row_table(t: int, row: int) -> List:
+    table = []
+    for byte in range(256):
+        bits = 0
+        for x in range(8):
+            if byte >> x & 1:
+                bits |= 1 << PERMUTATIONS[t][x + 8 * row]
+        table.append(bits)
+    return table
+
+#ROW_TABLES[t][row][byte] is the transformed bitboard of one row holding byte
+ROW_TABLES = [[_row_table(t, row) for row in range(8)] for t in range(8)]
+
+#turn a board string into binary digits for one colour
+_BLACK_DIGITS = str.maketrans('bw.', '100')
+_WHITE_DIGITS = str.maketrans('bw.', '010')
+
+def to_bitboards(board: List) -> Tuple:
+    '''
+    :param board: array of a board
+    :return: (black, white) bitboards
+    '''
+    #square 63 is the most significant digit
+    digits = ''.join([p or '.' for p in reversed(board)])
+    return (int(digits.translate(_BLACK_DIGITS), 2), int(digits.translate(_WHITE_DIGITS), 2))
+
+def transform_bitboard(bits: int, t: int) -> int:
+    tables = ROW_TABLES[t]
+    return (tables[0][bits & 0xFF] | tables[1][bits >> 8 & 0xFF] | tables[2][bits >> 16 & 0xFF] | tables[3][bits >> 24 & 0xFF] |
+            tables[4][bits >> 32 & 0xFF] | tables[5][bits >> 40 & 0xFF] | tables[6][bits >> 48 & 0xFF] | tables[7][bits >> 56])
+
+def canonical(board: List) -> Tuple:
+    '''
+    :param board: array of a board
+    :return: (canonical key, transform that maps board onto the canonical form)
+    '''
+    (black, white) = to_bitboards(board)
+    best = (black, white)
+    best_t = IDENTITY
+    for t in range(1, 8):
+        key = (transform_bitboard(black, t), transform_bitboard(white, t))
+        if key < best:
+            best = key
+            best_t = t
+    return (best, best_t)
+
+def transform_move(pos: int, t: int) -> int:
+    '''
+    maps a move on the original board onto the transformed board
+    '''
+    return PERMUTATIONS[t][pos]
+
+def untransform_move(pos: int, t: int) -> int:
+    '''
+    maps a move on the transformed board back onto the original board
+    '''
+    return PERMUTATIONS[INVERSE[t]][pos]
+
+def from_canonical(key: Tuple, t: int = IDENTITY) -> List:
+    '''
+    :param key: canonical key from canonical()
+    :param t: transform canonical() returned, to get the original board back rather than the canonical one
+    :return: array of the board
+    '''
+    (black, white) = key
+    if t != IDENTITY:
+        (black, white) = (transform_bitboard(black, INVERSE[t]), transform_bitboard(white, INVERSE[t]))
+    return ['b' if black >> pos & 1 else 'w' if white >> pos & 1 else None for pos in range(64)]